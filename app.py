@@ -1,7 +1,40 @@
+import io
+
 import streamlit as st
+import matplotlib
+matplotlib.use('Agg')  # Headless server: skip interactive backend discovery
 import matplotlib.pyplot as plt
 import numpy as np
-import matplotlib.patches as patches
+import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.patches import Patch
+
+# Labels are plain text in the bundled font: skip font fallback scans and mathtext parsing
+matplotlib.rcParams['font.sans-serif'] = ['DejaVu Sans']
+matplotlib.rcParams['text.parse_math'] = False
+# Fixed salt for SVG element ids, which are otherwise random per save
+matplotlib.rcParams['svg.hashsalt'] = 'ground-pipe-visualization'
+
+# Ground surface parameters
+GROUND_WIDTH = 10
+MAX_DEPTH = 12
+
+# Fixed horizontal positions of the pipe and the markers around it
+PIPE_X = GROUND_WIDTH / 2
+TRIANGLE_SIZE = 0.4
+TRIANGLE_X = GROUND_WIDTH * 0.8  # Position triangle at 80% of width
+GAP_ARROW_X = 8.0
+
+# Depth arrows measured from the surface: water table, pipe top, middle and bottom
+DEPTH_ARROW_X = np.array([1.5, 3.0, 4.5, 6.0])
+DEPTH_ARROW_LABELS = ['Water Table Depth', 'Pipe Top Depth', 'Pipe Middle', 'Pipe Bottom']
+
+def derived_depths(water_table_depth, pipe_top_depth, pipe_diameter):
+    # Water table, pipe top, pipe middle and pipe bottom depths, in DEPTH_ARROW_X order
+    return np.array([water_table_depth, pipe_top_depth,
+                     pipe_top_depth + pipe_diameter/2, pipe_top_depth + pipe_diameter])
 
 def main():
     st.title("Underground Pipe and Water Table Visualization")
@@ -9,135 +42,93 @@ def main():
     # Set up the sidebar for user inputs
     st.sidebar.header("Depth Parameters (meters)")
     
-    # User inputs for depths
-    water_table_depth = st.sidebar.slider("Water Table Depth", 1.0, 10.0, 5.0, 0.1)
-    pipe_top_depth = st.sidebar.slider("Pipe Top Depth", 0.5, 9.0, 3.0, 0.1)
-    pipe_diameter = st.sidebar.slider("Pipe Diameter", 0.1, 2.0, 0.5, 0.1)
+    # User inputs for depths, batched in a form so adjusting several sliders
+    # costs a single rerun when "Update" is pressed
+    with st.sidebar.form("depth_params"):
+        water_table_depth = st.slider("Water Table Depth", 1.0, 10.0, 5.0, 0.1)
+        pipe_top_depth = st.slider("Pipe Top Depth", 0.5, 9.0, 3.0, 0.1)
+        pipe_diameter = st.slider("Pipe Diameter", 0.1, 2.0, 0.5, 0.1)
+        st.form_submit_button("Update")
     
     # Derived measurements
-    pipe_middle_depth = pipe_top_depth + pipe_diameter/2
-    pipe_bottom_depth = pipe_top_depth + pipe_diameter
+    depths = derived_depths(water_table_depth, pipe_top_depth, pipe_diameter)
     
     # Gap between water table and pipe top
-    water_pipe_gap = water_table_depth - pipe_top_depth if water_table_depth > pipe_top_depth else 0
+    water_pipe_gap = max(water_table_depth - pipe_top_depth, 0)
+    
+    # Build the figure once per session and only move its artists on later reruns
+    if 'fig' not in st.session_state:
+        st.session_state.fig, st.session_state.artists = _init_fig()
     
-    # Create the visualization
-    create_visualization(water_table_depth, pipe_top_depth, pipe_middle_depth, 
-                         pipe_bottom_depth, pipe_diameter, water_pipe_gap)
+    # Create the visualization (sliders snap to 0.1 m, so round to keep cache keys exact)
+    svg = render_svg(round(water_table_depth, 1), round(pipe_top_depth, 1), round(pipe_diameter, 1),
+                     st.session_state.fig, st.session_state.artists)
+    # Stretch to the column like st.pyplot did. The SVG is still sent inline as a
+    # base64 data URI on every rerun; the cache only saves the server-side render.
+    st.image(svg, width="stretch")
+    
+    # Display additional information
+    show_summary(depths, pipe_diameter, water_pipe_gap)
+
+@st.cache_data(max_entries=256)
+def render_svg(water_table_depth, pipe_top_depth, pipe_diameter, _fig, _artists):
+    # Ship vector output so the browser does the rasterizing instead of the server;
+    # no timestamp, so identical inputs always give an identical string
+    _update(_artists, water_table_depth, pipe_top_depth, pipe_diameter)
+    buf = io.StringIO()
+    _fig.savefig(buf, format='svg', bbox_inches='tight', metadata={'Date': None})
+    return buf.getvalue()
 
-def create_visualization(water_table_depth, pipe_top_depth, pipe_middle_depth, 
-                         pipe_bottom_depth, pipe_diameter, water_pipe_gap):
-    # Create figure and axis with a fixed aspect ratio to ensure circles appear circular
-    fig, ax = plt.subplots(figsize=(10, 8))
-    
-    # Ground surface parameters
-    ground_width = 10
-    max_depth = 12
-    
-    # Draw ground surface
-    ground_x = np.linspace(0, ground_width, 500)
-    ground_surface = 0.1 * np.sin(ground_x * 2) + 0.05 * np.random.randn(len(ground_x))
+def _init_fig():
+    # Create figure and axis with a fixed aspect ratio to ensure circles appear circular.
+    # Built without pyplot so the figure is freed with its session instead of being
+    # kept alive by pyplot's global figure registry.
+    fig = Figure(figsize=(10, 8), dpi=72)
+    ax = fig.subplots()
+    artists = {}
+    
+    # Draw ground surface, seeded so the terrain is identical in every session
+    ground_x = np.linspace(0, GROUND_WIDTH, 500)
+    ground_surface = 0.1 * np.sin(ground_x * 2) + 0.05 * np.random.default_rng(0).standard_normal(len(ground_x))
     ax.plot(ground_x, ground_surface, 'k-', linewidth=2)
-    ax.fill_between(ground_x, ground_surface, max_depth, color='sienna', alpha=0.5)
+    ax.fill_between(ground_x, ground_surface, MAX_DEPTH, color='sienna', alpha=0.5)
     
-    # Draw water table
-    ax.axhline(y=water_table_depth, color='royalblue', linestyle='-', linewidth=2)
-    ax.fill_between(ground_x, water_table_depth, max_depth, color='royalblue', alpha=0.3)
+    # Draw water table (positions are filled in by _update)
+    artists['water_line'] = ax.axhline(y=0, color='royalblue', linestyle='-', linewidth=2)
+    artists['water_fill'] = plt.Rectangle((0, 0), GROUND_WIDTH, 0, color='royalblue', alpha=0.3, linewidth=0)
+    ax.add_patch(artists['water_fill'])
     
     # Add blue triangle marker for water table top
-    triangle_size = 0.4
-    triangle_x = ground_width * 0.8  # Position triangle at 80% of width
-    water_triangle = plt.Polygon(
-        [[triangle_x, water_table_depth - triangle_size/2], 
-         [triangle_x - triangle_size/2, water_table_depth - triangle_size], 
-         [triangle_x + triangle_size/2, water_table_depth - triangle_size]],
-        closed=True, color='royalblue')
-    ax.add_patch(water_triangle)
-    ax.text(triangle_x, water_table_depth - triangle_size - 0.2, 'Water Table',
-            ha='center', va='top', color='royalblue', fontweight='bold')
-    
-    # Position the pipe
-    pipe_x = ground_width / 2
-    pipe_radius = pipe_diameter / 2
+    artists['water_triangle'] = plt.Polygon(np.zeros((3, 2)), closed=True, color='royalblue')
+    ax.add_patch(artists['water_triangle'])
+    artists['water_label'] = ax.text(TRIANGLE_X, 0, 'Water Table',
+                                     ha='center', va='top', color='royalblue', fontweight='bold')
     
-    # Draw horizontal dimension lines (behind the pipe)
-    line_start_x = 0
-    line_end_x = pipe_x - pipe_radius - 0.1  # Stop before reaching the pipe
+    # Draw horizontal dimension lines (behind the pipe): top, middle and bottom, left then right
     line_style = {'color': 'darkgray', 'linestyle': '--', 'linewidth': 1}
-    
-    # Top of pipe horizontal line
-    ax.plot([line_start_x, line_end_x], [pipe_top_depth, pipe_top_depth], **line_style)
-    
-    # Middle of pipe horizontal line
-    ax.plot([line_start_x, line_end_x], [pipe_middle_depth, pipe_middle_depth], **line_style)
-    
-    # Bottom of pipe horizontal line
-    ax.plot([line_start_x, line_end_x], [pipe_bottom_depth, pipe_bottom_depth], **line_style)
-    
-    # Right side horizontal lines
-    line_start_x = pipe_x + pipe_radius + 0.1  # Start after the pipe
-    line_end_x = ground_width
-    
-    # Top of pipe horizontal line (right side)
-    ax.plot([line_start_x, line_end_x], [pipe_top_depth, pipe_top_depth], **line_style)
-    
-    # Middle of pipe horizontal line (right side)
-    ax.plot([line_start_x, line_end_x], [pipe_middle_depth, pipe_middle_depth], **line_style)
-    
-    # Bottom of pipe horizontal line (right side)
-    ax.plot([line_start_x, line_end_x], [pipe_bottom_depth, pipe_bottom_depth], **line_style)
+    artists['dim_lines'] = [ax.plot([0, 0], [0, 0], **line_style)[0] for _ in range(6)]
     
     # Draw pipe (circular) - AFTER drawing dimension lines to ensure it's on top
-    circle = plt.Circle((pipe_x, pipe_middle_depth), pipe_radius, facecolor='silver', 
-                        edgecolor='black', alpha=0.8, zorder=5)
-    ax.add_patch(circle)
-    
-    # Add depth arrows (positioned to avoid overlap)
-    arrow_props = dict(arrowstyle='<->', color='black', linewidth=1.5)
-    
-    # Position the arrows at different x-coordinates
-    water_arrow_x = 1.5
-    pipe_top_arrow_x = 3.0
-    pipe_middle_arrow_x = 4.5
-    pipe_bottom_arrow_x = 6.0
-    gap_arrow_x = 8.0
-    
-    # Water table depth arrow
-    ax.annotate('', xy=(water_arrow_x, 0), xytext=(water_arrow_x, water_table_depth),
-                arrowprops=arrow_props)
-    ax.text(water_arrow_x + 0.2, water_table_depth/2, f'Water Table Depth\n{water_table_depth:.1f} m', 
-           ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
-    
-    # Pipe top depth arrow
-    ax.annotate('', xy=(pipe_top_arrow_x, 0), xytext=(pipe_top_arrow_x, pipe_top_depth),
-                arrowprops=arrow_props)
-    ax.text(pipe_top_arrow_x + 0.2, pipe_top_depth/2, f'Pipe Top Depth\n{pipe_top_depth:.1f} m', 
-           ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
-    
-    # Pipe middle depth arrow
-    ax.annotate('', xy=(pipe_middle_arrow_x, 0), xytext=(pipe_middle_arrow_x, pipe_middle_depth),
-                arrowprops=arrow_props)
-    ax.text(pipe_middle_arrow_x + 0.2, pipe_middle_depth/2, f'Pipe Middle\n{pipe_middle_depth:.1f} m', 
-           ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
-    
-    # Pipe bottom depth arrow
-    ax.annotate('', xy=(pipe_bottom_arrow_x, 0), xytext=(pipe_bottom_arrow_x, pipe_bottom_depth),
-                arrowprops=arrow_props)
-    ax.text(pipe_bottom_arrow_x + 0.2, pipe_bottom_depth/2, f'Pipe Bottom\n{pipe_bottom_depth:.1f} m', 
-           ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
-    
-    # Gap between water table and pipe (if pipe is above water table)
-    if water_pipe_gap > 0:
-        ax.annotate('', xy=(gap_arrow_x, pipe_top_depth), 
-                   xytext=(gap_arrow_x, water_table_depth),
-                   arrowprops=arrow_props)
-        ax.text(gap_arrow_x + 0.2, pipe_top_depth + water_pipe_gap/2, 
-               f'Gap\n{water_pipe_gap:.1f} m', 
-               ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
+    artists['pipe_patch'] = plt.Circle((PIPE_X, 0), 0, facecolor='silver',
+                                       edgecolor='black', alpha=0.8, zorder=5)
+    ax.add_patch(artists['pipe_patch'])
+    
+    # Add depth arrows (positioned to avoid overlap): one collection for the shafts,
+    # with marker lines standing in for the arrowheads at either end
+    text_props = dict(ha='left', va='center', bbox=dict(facecolor='white', alpha=0.7))
+    artists['depth_arrows'] = ax.add_collection(LineCollection([], colors='black', linewidths=1.5))
+    ax.plot(DEPTH_ARROW_X, [0] * len(DEPTH_ARROW_X), '^', color='black', markersize=6)
+    artists['depth_heads'] = ax.plot([], [], 'v', color='black', markersize=6)[0]
+    artists['depth_texts'] = [ax.text(x + 0.2, 0, '', **text_props) for x in DEPTH_ARROW_X]
+    
+    # Gap arrow between water table and pipe top
+    artists['gap_arrow'] = ax.annotate('', xy=(0, 0), xytext=(0, 0),
+                                       arrowprops=dict(arrowstyle='<->', color='black', linewidth=1.5))
+    artists['gap_text'] = ax.text(0, 0, '', **text_props)
     
     # Set axis properties
-    ax.set_xlim(0, ground_width)
-    ax.set_ylim(max_depth, -1)  # Invert y-axis to show depth increasing downward
+    ax.set_xlim(0, GROUND_WIDTH)
+    ax.set_ylim(MAX_DEPTH, -1)  # Invert y-axis to show depth increasing downward
     ax.set_xlabel('Distance (m)')
     ax.set_ylabel('Depth (m)')
     ax.set_title('Ground Surface with Underground Pipe and Water Table')
@@ -147,8 +138,6 @@ def create_visualization(water_table_depth, pipe_top_depth, pipe_middle_depth,
     ax.set_aspect('equal')
     
     # Add legend
-    from matplotlib.patches import Patch
-    from matplotlib.lines import Line2D
     legend_elements = [
         Line2D([0], [0], color='k', lw=2, label='Ground Surface'),
         Line2D([0], [0], color='royalblue', lw=2, label='Water Table'),
@@ -157,24 +146,67 @@ def create_visualization(water_table_depth, pipe_top_depth, pipe_middle_depth,
     ]
     ax.legend(handles=legend_elements, loc='upper right')
     
-    # Display the figure in Streamlit
-    st.pyplot(fig)
+    return fig, artists
+
+def _update(artists, water_table_depth, pipe_top_depth, pipe_diameter):
+    # Derived measurements
+    depths = derived_depths(water_table_depth, pipe_top_depth, pipe_diameter)
+    depth_labels = [f'{depth:.1f} m' for depth in depths]
+    pipe_middle_depth = depths[2]
+    water_pipe_gap = max(water_table_depth - pipe_top_depth, 0)
+    
+    # Water table line and fill
+    artists['water_line'].set_ydata([water_table_depth, water_table_depth])
+    artists['water_fill'].set_y(water_table_depth)
+    artists['water_fill'].set_height(MAX_DEPTH - water_table_depth)
+    
+    # Water table triangle marker and label
+    artists['water_triangle'].set_xy(
+        [[TRIANGLE_X, water_table_depth - TRIANGLE_SIZE/2], 
+         [TRIANGLE_X - TRIANGLE_SIZE/2, water_table_depth - TRIANGLE_SIZE], 
+         [TRIANGLE_X + TRIANGLE_SIZE/2, water_table_depth - TRIANGLE_SIZE]])
+    artists['water_label'].set_y(water_table_depth - TRIANGLE_SIZE - 0.2)
+    
+    # Dimension lines stop short of the pipe on either side
+    pipe_radius = pipe_diameter / 2
+    left_x = [0, PIPE_X - pipe_radius - 0.1]
+    right_x = [PIPE_X + pipe_radius + 0.1, GROUND_WIDTH]
+    xs = [left_x] * 3 + [right_x] * 3
+    for line, x, depth in zip(artists['dim_lines'], xs, np.tile(depths[1:], 2)):
+        line.set_data(x, [depth, depth])
+    
+    # Pipe
+    artists['pipe_patch'].set_center((PIPE_X, pipe_middle_depth))
+    artists['pipe_patch'].set_radius(pipe_radius)
+    
+    # Depth arrows from the surface
+    artists['depth_arrows'].set_segments(np.stack([
+        np.column_stack([DEPTH_ARROW_X, np.zeros_like(depths)]),
+        np.column_stack([DEPTH_ARROW_X, depths]),
+    ], axis=1))
+    artists['depth_heads'].set_data(DEPTH_ARROW_X, depths)
+    for text, midpoint, name, value in zip(artists['depth_texts'], depths / 2, DEPTH_ARROW_LABELS, depth_labels):
+        text.set_y(midpoint)
+        text.set_text(f'{name}\n{value}')
     
-    # Display additional information
+    # Gap between water table and pipe (if pipe is above water table)
+    artists['gap_arrow'].set_visible(water_pipe_gap > 0)
+    artists['gap_text'].set_visible(water_pipe_gap > 0)
+    artists['gap_arrow'].xy = (GAP_ARROW_X, pipe_top_depth)
+    artists['gap_arrow'].xyann = (GAP_ARROW_X, water_table_depth)
+    artists['gap_text'].set_position((GAP_ARROW_X + 0.2, pipe_top_depth + water_pipe_gap/2))
+    artists['gap_text'].set_text(f'Gap\n{water_pipe_gap:.1f} m')
+
+def show_summary(depths, pipe_diameter, water_pipe_gap):
+    # One table element instead of a grid of individual metric widgets
     st.subheader("Measurement Summary")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Water Table Depth", f"{water_table_depth:.1f} m")
-        st.metric("Pipe Top Depth", f"{pipe_top_depth:.1f} m")
-    with col2:
-        st.metric("Pipe Middle Depth", f"{pipe_middle_depth:.1f} m")
-        st.metric("Pipe Bottom Depth", f"{pipe_bottom_depth:.1f} m")
-    with col3:
-        st.metric("Pipe Diameter", f"{pipe_diameter:.1f} m")
-        if water_pipe_gap > 0:
-            st.metric("Water-Pipe Gap", f"{water_pipe_gap:.1f} m")
-        else:
-            st.metric("Water-Pipe Gap", "Pipe is below water table")
+    summary = pd.DataFrame({
+        'Measurement': ['Water Table Depth', 'Pipe Top Depth', 'Pipe Middle Depth',
+                        'Pipe Bottom Depth', 'Pipe Diameter', 'Water-Pipe Gap'],
+        'Value': [f"{value:.1f} m" for value in (*depths, pipe_diameter)]
+                 + [f"{water_pipe_gap:.1f} m" if water_pipe_gap > 0 else "Pipe is below water table"],
+    })
+    st.dataframe(summary, hide_index=True)
 
 if __name__ == "__main__":
     main()